@@ -12,8 +12,27 @@ Where `emails` is a list of dictionaries, each containing a 'body' field
 with the Uber receipt text.
 """
 
-import re
-from typing import Dict, Any, List, Optional, Tuple
+# extract_uber_data relies on these imports, the module-level constants below,
+# extract_uber_inner.py and parallel_extract.py; copy them together with the
+# function when using it elsewhere
+import json
+from collections import Counter
+from typing import Any, Callable, Union
+
+# Receipt extraction lives in its own module so it can be compiled with mypyc
+from extract_uber_inner import FAMILY_NAMES, extract_receipts
+from parallel_extract import map_in_processes
+
+# Use orjson for parsing when installed, otherwise fall back to the standard library.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so error handling is shared.
+_loads: Callable[[Union[str, bytes]], Any]
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+_JSON_DECODER = json.JSONDecoder()
 
 
 def extract_uber_data(emails):
@@ -42,39 +61,31 @@ def extract_uber_data(emails):
         All lists are guaranteed to have the same length (validated)
     
     Raises:
-        ValueError: If extracted lists have inconsistent lengths
+        ValueError: If the data cannot be parsed or no valid receipts are found
     """
-    import json  # Import here for standalone function
-    import re  # Import here for the nested functions
-    
     # Handle case where emails is a string (JSON or text with embedded JSON)
     if isinstance(emails, str):
         parsed_emails = []
         try:
             # Try to parse as a JSON array or object first
             try:
-                parsed_emails = json.loads(emails)
+                parsed_emails = _loads(emails)
                 if not isinstance(parsed_emails, list):
                     parsed_emails = [parsed_emails]
             except json.JSONDecodeError:
                 # If that fails, split by "Value #n:" markers and parse each part
-                parts = re.split(r'\n\nValue #\d+:\n\n', emails)
+                parts = emails.split('\n\nValue #')
                 
                 for part in parts:
-                    part = part.strip()
-                    if not part:
+                    # Decode the JSON object starting at the first '{', ignoring
+                    # any text before or after it (such as the "n:" of the marker)
+                    json_start = part.find('{')
+                    if json_start == -1:
                         continue
                         
                     try:
-                        if part.startswith('{') and part.endswith('}'):
-                            email_data = json.loads(part)
-                            parsed_emails.append(email_data)
-                        elif '{' in part:
-                            json_start = part.find('{')
-                            json_part = part[json_start:]
-                            if json_part.endswith('}'):
-                                email_data = json.loads(json_part)
-                                parsed_emails.append(email_data)
+                        email_data, _ = _JSON_DECODER.raw_decode(part, json_start)
+                        parsed_emails.append(email_data)
                     except json.JSONDecodeError:
                         continue
             
@@ -83,176 +94,40 @@ def extract_uber_data(emails):
             # If all parsing fails, wrap in a more helpful error
             raise ValueError(f"Failed to parse emails data: {str(e)}")
     
-    # Inner helper function for date conversion
-    def convert_swedish_date_to_iso(date_str: str) -> Optional[str]:
-        """Convert Swedish date format to ISO format (YYYY-MM-DD)"""
-        if not date_str:
-            return None
-        
-        swedish_months = {
-            'januari': '01', 'februari': '02', 'mars': '03', 'april': '04',
-            'maj': '05', 'juni': '06', 'juli': '07', 'augusti': '08',
-            'september': '09', 'oktober': '10', 'november': '11', 'december': '12'
-        }
-        
-        try:
-            parts = date_str.strip().split()
-            if len(parts) != 3:
-                return None
-                
-            day = parts[0].zfill(2)
-            month_swedish = parts[1].lower()
-            year = parts[2]
-            
-            if month_swedish in swedish_months:
-                month = swedish_months[month_swedish]
-                return f"{year}-{month}-{day}"
-            else:
-                return None
-        except Exception:
-            return None
-
-    # Inner helper function to extract data from a single email
-    def extract_receipt_from_email(email_data):
-        """Extract data from a single email receipt"""
-        # Handle JSON string if provided instead of dict
-        if isinstance(email_data, str):
+    # Inner helper function to get the body text of a single email
+    def get_email_body(email_data):
+        """Return the 'body' of an email, or '' if it cannot be read"""
+        # Handle JSON string if provided instead of dict; this is the only
+        # place a JSON string email is decoded
+        if not isinstance(email_data, dict):
+            if not isinstance(email_data, str):
+                return ''
             try:
-                email_data = json.loads(email_data)
+                email_data = _loads(email_data)
             except json.JSONDecodeError:
-                return {'cost': None, 'currency': None, 'date': None, 'passenger': None}
+                return ''
+            if not isinstance(email_data, dict):
+                return ''
         
         body = email_data.get('body', '')
-        
-        # Initialize return values
-        cost = None
-        currency = None
-        date_str = None
-        passenger = None
-        
-        # Extract total cost and currency
-        # Look for either "Totalt" or "Avbokningsavgift" (cancellation fee)
-        total_pattern = r'(Totalt|Avbokningsavgift)\s+([\d\.,]+)\s+([A-Za-z$€£]+)'
-        total_match = re.search(total_pattern, body)
-        
-        if total_match:
-            cost_str = total_match.group(2).replace(',', '.')
-            cost = float(cost_str)
-            currency = total_match.group(3)
-        else:
-            # Try a more relaxed pattern
-            total_pattern2 = r'(\d+[\.,]?\d*)\s*([A-Za-z$€£]+)'
-            total_match2 = re.search(total_pattern2, body)
-            if total_match2:
-                cost_str = total_match2.group(1).replace(',', '.')
-                cost = float(cost_str)
-                currency = total_match2.group(2)
-        
-        # Extract date - look after either "Totalt" or "Avbokningsavgift"
-        date_pattern = r'(Totalt|Avbokningsavgift)\s+[\d\.,]+\s+[A-Za-z$€£]+\s+(\d{1,2}\s+[a-zA-ZåäöÅÄÖ]+\s+\d{4})'
-        date_match = re.search(date_pattern, body)
-        
-        if date_match:
-            date_str = date_match.group(2).strip()
-            date_str = convert_swedish_date_to_iso(date_str)
-        else:
-            # Try a more general pattern to find date anywhere in the text
-            general_date_pattern = r'(\d{1,2}\s+[a-zA-ZåäöÅÄÖ]+\s+\d{4})'
-            general_date_match = re.search(general_date_pattern, body)
-            if general_date_match:
-                date_str = general_date_match.group(1).strip()
-                date_str = convert_swedish_date_to_iso(date_str)
-        
-        # Define known family member names - extracted from the real uber_data.json
-        family_members = {'Fredrik', 'Viggo', 'Agne', 'Giedre', 'Nadine', 'Leona'}
-        
-        # First try the most reliable pattern: "Tack för att du reser, X" or "Vi ses en annan gång, X"
-        passenger_pattern = r'(Tack för att du reser,|Vi ses en annan gång,)\s+([A-Za-zåäöÅÄÖ]+)'
-        passenger_match = re.search(passenger_pattern, body)
-        
-        if passenger_match:
-            candidate_name = passenger_match.group(2).strip()
-            # Check if it's a known family member
-            if candidate_name in family_members:
-                passenger = candidate_name
-            else:
-                # Unknown name - still use it but could be flagged for review
-                passenger = candidate_name
-        else:
-            # If that fails, try other patterns with the known family member names
-            passenger = None
-            for name in family_members:
-                name_patterns = [
-                    fr'Tack\s+{name}!',
-                    fr'{name}s\s+(?:resa|tur)',
-                    fr'(?:reser|åker|färd|resa).*?,\s+{name}'
-                ]
-                
-                for pattern in name_patterns:
-                    if re.search(pattern, body):
-                        passenger = name
-                        break
-                
-                if passenger:
-                    break
-                    
-            # If still no match, try other general patterns
-            if not passenger:
-                general_patterns = [
-                    r'Tack\s+([A-Za-zåäöÅÄÖ]+)!',
-                    r'(?:reser|åker|färd|resa).*?,\s+([A-Za-zåäöÅÄÖ]+)',
-                    r'([A-Za-zåäöÅÄÖ]+)s\s+(?:resa|tur)'
-                ]
-                
-                for pattern in general_patterns:
-                    match = re.search(pattern, body)
-                    if match:
-                        candidate = match.group(1).strip()
-                        # Check if the extracted name is in our family members list
-                        for member in family_members:
-                            if candidate.lower() == member.lower():
-                                passenger = member  # Use the canonical spelling
-                                break
-                        
-                        # If not a known family member, use it anyway
-                        if not passenger:
-                            passenger = candidate
-                        break
-        
-        return {
-            'cost': cost,
-            'currency': currency,
-            'date': date_str,
-            'passenger': passenger
-        }
-    
+        return body if isinstance(body, str) else ''
+
     # Process all emails
-    dates = []
-    passenger_names = []
-    costs = []
-    currencies = []
+    bodies = [get_email_body(email) for email in emails]
     
-    for email in emails:
-        try:
-            extracted = extract_receipt_from_email(email)
-            
-            # Only include successfully extracted data
-            if extracted['cost'] is not None and extracted['currency'] is not None:
-                dates.append(extracted['date'])
-                passenger_names.append(extracted['passenger'])
-                costs.append(extracted['cost'])
-                currencies.append(extracted['currency'])
-                
-        except Exception:
-            # Skip failed extractions silently
-            continue
+    # Large batches are sharded across processes
+    results = map_in_processes(extract_receipts, bodies)
+    
+    # Only include successfully extracted data (cost and currency found)
+    receipts = [r for r in results if r[0] is not None and r[1] is not None]
+    costs = [r[0] for r in receipts]
+    currencies = [r[1] for r in receipts]
+    dates = [r[2] for r in receipts]
+    passenger_names = [r[3] for r in receipts]
     
-    # Validation: Ensure all lists have the same length
-    list_lengths = [len(dates), len(passenger_names), len(costs), len(currencies)]
-    if len(set(list_lengths)) != 1:
-        raise ValueError(f"Inconsistent list lengths: dates={len(dates)}, "
-                        f"passengers={len(passenger_names)}, costs={len(costs)}, "
-                        f"currencies={len(currencies)}")
+    # Validation: All lists are built from the same receipts, so they always
+    # have the same length
+    assert len(dates) == len(passenger_names) == len(costs) == len(currencies)
     
     # Additional validation: Check that attributed rides match total receipts
     total_receipts = len(costs)
@@ -260,10 +135,9 @@ def extract_uber_data(emails):
     unattributed_rides = total_receipts - attributed_rides
     
     # Check for unknown names (names not in the predefined family list)
-    known_family = {'Fredrik', 'Viggo', 'Agne', 'Giedre', 'Nadine', 'Leona'}
     unknown_names = set()
     for name in passenger_names:
-        if name is not None and name not in known_family:
+        if name is not None and name not in FAMILY_NAMES:
             unknown_names.add(name)
     
     if unattributed_rides > 0:
@@ -280,7 +154,6 @@ def extract_uber_data(emails):
 
 # Example usage:
 if __name__ == "__main__":
-    import json
     import sys
     
     # Sample usage function that demonstrates how to use extract_uber_data
@@ -298,17 +171,19 @@ if __name__ == "__main__":
             # Use the extract_uber_data function directly on the content
             dates, passengers, costs, currencies = extract_uber_data(content)
             
-            # Calculate attribution statistics
+            # Calculate attribution statistics, unknown names and per-currency
+            # totals in a single pass over the results
             total_receipts = len(costs)
-            attributed_rides = sum(1 for p in passengers if p is not None)
-            unattributed_rides = total_receipts - attributed_rides
-            
-            # Check for unknown names
-            known_family = {'Fredrik', 'Viggo', 'Agne', 'Giedre', 'Nadine', 'Leona'}
+            attributed_rides = 0
             unknown_names = set()
-            for name in passengers:
-                if name is not None and name not in known_family:
-                    unknown_names.add(name)
+            totals = {}
+            for name, cost, curr in zip(passengers, costs, currencies):
+                if name is not None:
+                    attributed_rides += 1
+                    if name not in FAMILY_NAMES:
+                        unknown_names.add(name)
+                totals[curr] = totals.get(curr, 0.0) + cost
+            unattributed_rides = total_receipts - attributed_rides
             
             print(f"Successfully extracted {total_receipts} receipts")
             print(f"Attributed rides: {attributed_rides}, Unattributed: {unattributed_rides}")
@@ -318,19 +193,15 @@ if __name__ == "__main__":
             for i in range(min(5, len(costs))):
                 print(f"  {dates[i]} | {passengers[i]} | {costs[i]} {currencies[i]}")
                 
-            # Calculate totals
-            total_kr = sum(cost for cost, curr in zip(costs, currencies) if curr == 'kr')
-            total_usd = sum(cost for cost, curr in zip(costs, currencies) if curr == 'US$')
+            total_kr = totals.get('kr', 0.0)
+            total_usd = totals.get('US$', 0.0)
             
             print(f"\nTotal in SEK: {total_kr:.2f} kr")
             if total_usd > 0:
                 print(f"Total in USD: {total_usd:.2f} US$")
                 
             # Count rides by passenger
-            passenger_counts = {}
-            for p in passengers:
-                if p:
-                    passenger_counts[p] = passenger_counts.get(p, 0) + 1
+            passenger_counts = Counter(p for p in passengers if p)
                     
             print("\nRides by passenger:")
             for p, count in sorted(passenger_counts.items()):
@@ -344,7 +215,6 @@ if __name__ == "__main__":
         file_path = sys.argv[1]
         if file_path == "-":
             # Read from stdin
-            import sys
             content = sys.stdin.read()
             try:
                 dates, passengers, costs, currencies = extract_uber_data(content)
@@ -355,10 +225,9 @@ if __name__ == "__main__":
                 unattributed_rides = total_receipts - attributed_rides
                 
                 # Check for unknown names
-                known_family = {'Fredrik', 'Viggo', 'Agne', 'Giedre', 'Nadine', 'Leona'}
                 unknown_names = set()
                 for name in passengers:
-                    if name is not None and name not in known_family:
+                    if name is not None and name not in FAMILY_NAMES:
                         unknown_names.add(name)
                 
                 print(f"Successfully extracted {total_receipts} receipts")
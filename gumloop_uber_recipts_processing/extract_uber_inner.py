@@ -0,0 +1,165 @@
+"""
+Uber Receipt Data Extractor - Receipt Extraction
+
+The hot loop used by extract_uber_data, kept in its own fully typed module
+so it can be compiled to a C extension with mypyc:
+
+    mypyc extract_uber_inner.py
+
+Python imports the compiled extension in place of this file when it is
+present, and this pure Python version is used otherwise.
+"""
+
+import re
+from typing import Dict, FrozenSet, List, Optional, Pattern, Tuple
+
+# Known family member names - extracted from the real uber_data.json
+FAMILY_MEMBERS: Tuple[str, ...] = ('Fredrik', 'Viggo', 'Agne', 'Giedre', 'Nadine', 'Leona')
+# The same names as a set, for membership tests
+FAMILY_NAMES: FrozenSet[str] = frozenset(FAMILY_MEMBERS)
+# Lowercase name -> canonical spelling
+_FAMILY_LOWER: Dict[str, str] = {name.lower(): name for name in FAMILY_NAMES}
+
+_SWEDISH_MONTHS: Dict[str, str] = {
+    'januari': '01', 'februari': '02', 'mars': '03', 'april': '04',
+    'maj': '05', 'juni': '06', 'juli': '07', 'augusti': '08',
+    'september': '09', 'oktober': '10', 'november': '11', 'december': '12'
+}
+
+# Regex patterns are compiled once at import time instead of per email
+# The optional trailing group captures the receipt date that follows the total
+_TOTAL_RE = re.compile(r'(Totalt|Avbokningsavgift)\s+([\d\.,]+)\s+([A-Za-z$€£]+)(?:\s+(\d{1,2}\s+[a-zA-ZåäöÅÄÖ]+\s+\d{4}))?')
+# Date after any "Totalt" or "Avbokningsavgift" amount, for receipts whose first
+# total has no date after it
+_DATE_RE = re.compile(r'(?:Totalt|Avbokningsavgift)\s+[\d\.,]+\s+[A-Za-z$€£]+\s+(\d{1,2}\s+[a-zA-ZåäöÅÄÖ]+\s+\d{4})')
+_TOTAL_FALLBACK_RE = re.compile(r'(\d+[\.,]?\d*)\s*([A-Za-z$€£]+)')
+_GENERAL_DATE_RE = re.compile(r'(\d{1,2}\s+[a-zA-ZåäöÅÄÖ]+\s+\d{4})')
+_PASSENGER_RE = re.compile(r'(Tack för att du reser,|Vi ses en annan gång,)\s+([A-Za-zåäöÅÄÖ]+)')
+_TACK_GENERIC_RE = re.compile(r'Tack\s+([A-Za-zåäöÅÄÖ]+)!')
+# The gap before the comma is bounded and cannot contain a comma or newline,
+# which keeps backtracking linear on comma-heavy bodies. This is narrower than
+# a lazy .*? gap: the name must follow the first comma after the keyword and
+# within 200 characters, so "resa med oss, vi hoppas, Fredrik" yields "vi"
+_TRAVEL_GENERIC_RE = re.compile(r'(?:reser|åker|färd|resa)[^,\n]{0,200},\s+([A-Za-zåäöÅÄÖ]+)')
+_POSSESSIVE_GENERIC_RE = re.compile(r'([A-Za-zåäöÅÄÖ]+)s\s+(?:resa|tur)')
+# All family member names in one alternation, so each pattern scans the body once
+_FAMILY_ALT = '(?:' + '|'.join(map(re.escape, FAMILY_MEMBERS)) + ')'
+_FAM_TACK = re.compile(fr'Tack\s+({_FAMILY_ALT})!')
+_FAM_POSSESSIVE = re.compile(fr'({_FAMILY_ALT})s\s+(?:resa|tur)')
+_FAM_TRAVEL = re.compile(fr'(?:reser|åker|färd|resa)[^,\n]{{0,200}},\s+({_FAMILY_ALT})')
+
+_FAMILY_PATTERNS: Tuple[Pattern[str], ...] = (_FAM_TACK, _FAM_POSSESSIVE, _FAM_TRAVEL)
+_GENERAL_PASSENGER_PATTERNS: Tuple[Pattern[str], ...] = (
+    _TACK_GENERIC_RE,
+    _TRAVEL_GENERIC_RE,
+    _POSSESSIVE_GENERIC_RE,
+)
+
+
+def convert_swedish_date_to_iso(date_str: str) -> Optional[str]:
+    """Convert Swedish date format to ISO format (YYYY-MM-DD)"""
+    if not date_str:
+        return None
+
+    try:
+        day, month_swedish, year = date_str.split()
+    except ValueError:
+        return None
+
+    month = _SWEDISH_MONTHS.get(month_swedish.lower())
+    if month is None:
+        return None
+    return f"{year}-{month}-{day.zfill(2)}"
+
+
+def parse_cost(cost_str: str) -> Optional[float]:
+    """Convert an amount like "124,00" to float (None if malformed)"""
+    try:
+        return float(cost_str.replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def extract_receipt_from_email(
+    body: str,
+) -> Tuple[Optional[float], Optional[str], Optional[str], Optional[str]]:
+    """
+    Extract data from a single email receipt.
+
+    Returns a (cost, currency, date, passenger) tuple.
+    """
+    # Initialize return values
+    cost: Optional[float] = None
+    currency: Optional[str] = None
+    date_str: Optional[str] = None
+    passenger: Optional[str] = None
+
+    # Extract total cost and currency
+    # Look for either "Totalt" or "Avbokningsavgift" (cancellation fee)
+    # No str.find prescreen or anchor here: with two keywords per pattern the
+    # extra find calls cost more than they save, as the total is usually at
+    # the very start of the body
+    total_match = _TOTAL_RE.search(body)
+    if total_match:
+        cost = parse_cost(total_match.group(2))
+        currency = total_match.group(3)
+    else:
+        # Try a more relaxed pattern
+        total_match2 = _TOTAL_FALLBACK_RE.search(body)
+        if total_match2:
+            cost = parse_cost(total_match2.group(1))
+            currency = total_match2.group(2)
+
+    # Extract date - captured right after "Totalt" or "Avbokningsavgift"
+    if total_match and total_match.group(4):
+        date_str = convert_swedish_date_to_iso(total_match.group(4))
+    else:
+        date_match = None
+        if total_match is not None:
+            # The first total has no date; look for one after a later total
+            # (without a total there is nothing for _DATE_RE to match)
+            date_match = _DATE_RE.search(body, total_match.start() + 1)
+        if date_match:
+            date_str = convert_swedish_date_to_iso(date_match.group(1))
+        else:
+            # Try a more general pattern to find date anywhere in the text
+            general_date_match = _GENERAL_DATE_RE.search(body)
+            if general_date_match:
+                date_str = convert_swedish_date_to_iso(general_date_match.group(1).strip())
+
+    # First try the most reliable pattern: "Tack för att du reser, X" or "Vi ses en annan gång, X"
+    passenger_match = _PASSENGER_RE.search(body)
+    if passenger_match:
+        # Unknown names are used as well but could be flagged for review
+        passenger = passenger_match.group(2).strip()
+    else:
+        # If that fails, try other patterns with the known family member names
+        for pattern in _FAMILY_PATTERNS:
+            match = pattern.search(body)
+            if match:
+                passenger = match.group(1)
+                break
+
+        # If still no match, try other general patterns
+        if not passenger:
+            for pattern in _GENERAL_PASSENGER_PATTERNS:
+                match = pattern.search(body)
+                if match:
+                    candidate = match.group(1).strip()
+                    # Use the canonical spelling of a known family member,
+                    # and if not a known family member, use it anyway
+                    passenger = _FAMILY_LOWER.get(candidate.lower(), candidate)
+                    break
+
+    return cost, currency, date_str, passenger
+
+
+def extract_receipts(
+    bodies: List[str],
+) -> List[Tuple[Optional[float], Optional[str], Optional[str], Optional[str]]]:
+    """
+    Extract a (cost, currency, date, passenger) tuple from each email body.
+
+    Takes and returns only plain data so it can run in a worker process.
+    """
+    return [extract_receipt_from_email(body) for body in bodies]
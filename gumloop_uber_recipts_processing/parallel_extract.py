@@ -0,0 +1,41 @@
+"""
+Uber Receipt Data Extractor - Process Pool
+
+Shards large lists of email bodies across worker processes. Used by both
+extract_uber_data and process_uber_receipts.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# Lists of at least this many emails are processed in a process pool (when
+# more than one CPU is available)
+_PARALLEL_MIN_EMAILS = 5000
+
+
+def map_in_processes(func: Callable[[List[T]], List[R]], items: List[T]) -> List[R]:
+    """
+    Apply func to items, sharding large lists across worker processes.
+
+    Args:
+        func: Module-level function (so it can be pickled) that takes a list
+              and returns one result per item
+        items: Items to process; they are independent of each other
+
+    Returns:
+        The results of func for all items, in order
+    """
+    cpu_count = os.cpu_count() or 1
+    if len(items) < _PARALLEL_MIN_EMAILS or cpu_count < 2:
+        return func(items)
+
+    # Several chunks per CPU keep all workers busy until the end
+    chunk_size = max(1, len(items) // (cpu_count * 4))
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    with ProcessPoolExecutor() as executor:
+        return [result for chunk_results in executor.map(func, chunks)
+                for result in chunk_results]
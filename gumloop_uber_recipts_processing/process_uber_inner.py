@@ -0,0 +1,166 @@
+"""
+Uber Receipt Data Extractor - Receipt Extraction
+
+The per-email extraction used by process_uber_receipts, kept in its own fully
+typed module so it can be compiled to a C extension with mypyc:
+
+    mypyc process_uber_inner.py
+
+Python imports the compiled extension in place of this file when it is
+present, and this pure Python version is used otherwise.
+"""
+
+import re
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+_SWEDISH_MONTHS: Dict[str, str] = {
+    'januari': '01', 'februari': '02', 'mars': '03', 'april': '04',
+    'maj': '05', 'juni': '06', 'juli': '07', 'augusti': '08',
+    'september': '09', 'oktober': '10', 'november': '11', 'december': '12'
+}
+
+# Regex patterns are compiled once at import time instead of per email
+# Total cost and currency from the first "Totalt" occurrence
+# This handles both "kr" and "US$" currencies; the optional trailing groups
+# capture the day, month and year of the date that usually follows the amount
+_TOTAL_RE = re.compile(r'Totalt\s+([\d\.,]+)\s+([A-Za-z$€£]+)(?:\s+([0-9]{1,2})\s+([a-zA-ZåäöÅÄÖ]+)\s+([0-9]{4}))?')
+# Date after the "Totalt" amount, in Swedish formats like "5 juli 2025", "7 februari 2025", etc.
+_DATE_RE = re.compile(r'Totalt\s+[\d\.,]+\s+[A-Za-z$€£]+\s+([0-9]{1,2})\s+([a-zA-ZåäöÅÄÖ]+)\s+([0-9]{4})')
+# Passenger name from "Tack för att du reser, [Name]"
+_PASSENGER_RE = re.compile(r'Tack för att du reser,\s+([A-Za-zåäöÅÄÖ]+)')
+
+
+def _swedish_date_parts_to_iso(day: str, month_swedish: str, year: str) -> Optional[str]:
+    """Build an ISO date from the day, Swedish month name and year (None for an unknown month)"""
+    if not month_swedish.islower():
+        month_swedish = month_swedish.lower()
+    month = _SWEDISH_MONTHS.get(month_swedish)
+    if month is None:
+        return None
+    return f"{year}-{month}-{day.zfill(2)}"
+
+
+def convert_swedish_date_to_iso(date_str: str) -> Optional[str]:
+    """
+    Convert Swedish date format to ISO format (YYYY-MM-DD)
+    
+    Args:
+        date_str: Date string in Swedish format like "5 juli 2025"
+        
+    Returns:
+        ISO formatted date string like "2025-07-05" or None if conversion fails
+    """
+    if not date_str:
+        return None
+    
+    # Parse Swedish date format "DD MONTH YYYY"
+    parts = date_str.split()
+    if len(parts) != 3:
+        return None
+    day, month_swedish, year = parts
+    return _swedish_date_parts_to_iso(day, month_swedish, year)
+
+
+def extract_receipt_fields(
+    body: str,
+) -> Tuple[Optional[float], Optional[str], Optional[str], Optional[str]]:
+    """
+    Extract cost, currency, date, and passenger from an Uber receipt email body.
+    
+    Args:
+        body: Email body text containing receipt information
+        
+    Returns:
+        Tuple of (cost, currency, date, passenger), each None if not found
+    """
+    # Initialize return values
+    cost: Optional[float] = None
+    currency: Optional[str] = None
+    date_str: Optional[str] = None
+    passenger: Optional[str] = None
+    
+    # Extract total cost and currency from the first "Totalt" occurrence
+    # This handles both "kr" and "US$" currencies
+    # A plain substring search finds the literal prefix first, so the regex
+    # only runs from there (and not at all when it is missing)
+    total_match = None
+    total_start = body.find('Totalt')
+    if total_start != -1:
+        total_match = _TOTAL_RE.search(body, total_start)
+    
+    if total_match:
+        # Replace comma with period for consistent decimal handling
+        # (str.replace is about 3x faster than str.translate on amounts this
+        # short, and float() keeps the exact rounding of the decimal string)
+        cost = float(total_match.group(1).replace(',', '.'))
+        # Currencies and passenger names repeat across receipts, so they are
+        # interned and every result shares one string object per value
+        currency = sys.intern(total_match.group(2))
+    
+    # Extract date - look for date pattern after "Totalt" amount and before "Tack för att du reser"
+    # This pattern captures Swedish date formats like "5 juli 2025", "7 februari 2025", etc.
+    # It is usually captured by the total match already; only search again
+    # (for a later "Totalt") when the first one has no date. The day, month
+    # and year come out as separate groups and are converted to ISO format
+    if total_match and total_match.group(3):
+        date_str = _swedish_date_parts_to_iso(*total_match.group(3, 4, 5))
+    elif total_match:
+        date_match = _DATE_RE.search(body, total_match.start() + 1)
+        if date_match:
+            date_str = _swedish_date_parts_to_iso(*date_match.groups())
+    
+    # Extract passenger name from "Tack för att du reser, [Name]"
+    passenger_start = body.find('Tack för att du reser,')
+    if passenger_start != -1:
+        passenger_match = _PASSENGER_RE.search(body, passenger_start)
+        if passenger_match:
+            passenger = sys.intern(passenger_match.group(1).strip())
+    
+    return cost, currency, date_str, passenger
+
+
+def extract_receipts(
+    bodies: List[Any],
+) -> List[Optional[Tuple[Optional[float], Optional[str], Optional[str], Optional[str]]]]:
+    """
+    Extract a (cost, currency, date, passenger) tuple from each email body,
+    or None for bodies that cannot be processed.
+    
+    Takes and returns only plain data so it can run in a worker process.
+    """
+    results: List[Optional[Tuple[Optional[float], Optional[str], Optional[str], Optional[str]]]] = []
+    for body in bodies:
+        try:
+            results.append(extract_receipt_fields(body))
+        except Exception:
+            results.append(None)
+    return results
+
+
+def extract_uber_receipt_data(email_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract cost, currency, date, and passenger from Uber receipt emails.
+    
+    Args:
+        email_data: Dictionary containing email data with 'body' field
+        
+    Returns:
+        Dictionary with extracted 'cost', 'currency', 'date', and 'passenger'
+    """
+    body = email_data.get('body', '')
+    cost, currency, date_str, passenger = extract_receipt_fields(body)
+    
+    # Handle special cases like cancellation fees
+    is_cancellation = 'Avbokningsavgift' in body
+    
+    return {
+        'email_id': email_data.get('id'),
+        'cost': cost,
+        'currency': currency,
+        'date': date_str,
+        'passenger': passenger,
+        'is_cancellation': is_cancellation,
+        'subject': email_data.get('subject', ''),
+        'email_date': email_data.get('date', '')
+    }
@@ -24,110 +24,161 @@ Returns:
 
 import re
 import json
+import mmap
+import os
 import sys
+import types
+from collections import Counter
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Type
 
+from parallel_extract import map_in_processes
+from process_uber_inner import extract_receipt_fields, extract_receipts
+# Re-exported so existing "from process_uber_receipts import ..." code keeps working
+from process_uber_inner import (  # noqa: F401
+    convert_swedish_date_to_iso,
+    extract_uber_receipt_data,
+)
 
-def convert_swedish_date_to_iso(date_str: str) -> Optional[str]:
+# Use the fastest installed JSON parser: orjson, then ujson, then the standard
+# library. All three accept bytes; each raises its own decode error type.
+_json: types.ModuleType
+_JSONDecodeError: Type[ValueError]
+try:
+    import orjson as _json
+    _JSONDecodeError = _json.JSONDecodeError
+except ImportError:
+    try:
+        import ujson as _json
+        _JSONDecodeError = ValueError
+    except ImportError:
+        _json = json
+        _JSONDecodeError = json.JSONDecodeError
+
+# "Value #N:" markers between emails in the raw (bytes) input file. The file
+# is read in binary mode, so Windows (CRLF) line endings are matched here
+_VALUE_SPLIT_RE = re.compile(rb'\r?\n\r?\nValue #\d+:\r?\n\r?\n')
+
+# The input file is read in chunks of this size
+_READ_CHUNK_SIZE = 1 << 20
+# A marker may be cut off at the end of a chunk, so this many trailing bytes
+# are searched again once the next chunk has been read (a CRLF marker is 16
+# bytes plus the digits of N)
+_MARKER_OVERLAP = 32
+# Regular files of at least this size are memory-mapped and scanned in place
+# instead of being read in chunks
+_MMAP_MIN_SIZE = _READ_CHUNK_SIZE
+
+
+def _parse_email_part(part: bytes) -> Optional[Dict[str, Any]]:
     """
-    Convert Swedish date format to ISO format (YYYY-MM-DD)
+    Parse one email from the text between two "Value #N:" markers.
     
     Args:
-        date_str: Date string in Swedish format like "5 juli 2025"
+        part: Raw bytes of the part, possibly with text before the JSON object
         
     Returns:
-        ISO formatted date string like "2025-07-05" or None if conversion fails
+        Email data dictionary or None if the part holds no email
     """
-    if not date_str:
+    part = part.strip()
+    if not part:
         return None
+        
+    email_data: Dict[str, Any]
+    try:
+        # Try to parse as JSON
+        if part.startswith(b'{') and part.endswith(b'}'):
+            email_data = _json.loads(part)
+            return email_data
+        # Handle the first entry which might not have a "Value #" prefix
+        if b'{' in part:
+            json_start = part.find(b'{')
+            json_part = part[json_start:]
+            if json_part.endswith(b'}'):
+                email_data = _json.loads(json_part)
+                return email_data
+    except _JSONDecodeError as e:
+        print(f"Warning: Could not parse JSON in part: {e}")
+    return None
+
+
+def iter_uber_emails(file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the email objects of an uber_data.json file one at a time.
     
-    # Swedish month mapping
-    swedish_months = {
-        'januari': '01', 'februari': '02', 'mars': '03', 'april': '04',
-        'maj': '05', 'juni': '06', 'juli': '07', 'augusti': '08',
-        'september': '09', 'oktober': '10', 'november': '11', 'december': '12'
-    }
+    Large regular files are memory-mapped and scanned in place; other files
+    are read in chunks. Either way only the email being parsed is copied into
+    memory. JSON strings cannot contain raw newlines, so a "Value #N:" marker
+    always ends the previous email and no brace matching is needed.
     
-    try:
-        # Parse Swedish date format "DD MONTH YYYY"
-        parts = date_str.strip().split()
-        if len(parts) != 3:
-            return None
-            
-        day = parts[0].zfill(2)  # Pad with zero if needed
-        month_swedish = parts[1].lower()
-        year = parts[2]
+    Args:
+        file_path: Path to the input JSON file
+        
+    Yields:
+        Email data dictionaries
         
-        if month_swedish in swedish_months:
-            month = swedish_months[month_swedish]
-            return f"{year}-{month}-{day}"
-        else:
-            return None
+    Raises:
+        OSError: If the file cannot be read
+    """
+    with open(file_path, 'rb') as f:
+        # Pipes and other special files report a size of 0 and are read in chunks
+        if os.fstat(f.fileno()).st_size >= _MMAP_MIN_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield from _iter_mapped_emails(mm)
+            return
+        
+        buffer = bytearray()
+        scan_from = 0
+        while True:
+            chunk = f.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            buffer += chunk
             
-    except Exception:
-        return None
+            # Emit every email that is followed by a marker
+            start = 0
+            marker = _VALUE_SPLIT_RE.search(buffer, scan_from)
+            while marker is not None:
+                email_data = _parse_email_part(bytes(buffer[start:marker.start()]))
+                if email_data is not None:
+                    yield email_data
+                start = marker.end()
+                marker = _VALUE_SPLIT_RE.search(buffer, start)
+            
+            # Drop the consumed emails; the rest belongs to the next one
+            del buffer[:start]
+            scan_from = max(0, len(buffer) - _MARKER_OVERLAP)
+    
+    # The last email runs to the end of the file
+    email_data = _parse_email_part(bytes(buffer))
+    if email_data is not None:
+        yield email_data
 
 
-def extract_uber_receipt_data(email_data: Dict[str, Any]) -> Dict[str, Any]:
+def _iter_mapped_emails(mm: mmap.mmap) -> Iterator[Dict[str, Any]]:
     """
-    Extract cost, currency, date, and passenger from Uber receipt emails.
+    Yield the email objects of a memory-mapped uber_data.json file.
+    
+    The markers are searched directly in the mapping and only the bytes of
+    the email being parsed are copied out of it.
     
     Args:
-        email_data: Dictionary containing email data with 'body' field
+        mm: Read-only memory map of the input file
         
-    Returns:
-        Dictionary with extracted 'cost', 'currency', 'date', and 'passenger'
+    Yields:
+        Email data dictionaries
     """
-    body = email_data.get('body', '')
-    
-    # Initialize return values
-    cost = None
-    currency = None
-    date_str = None
-    passenger = None
-    
-    # Extract total cost and currency from the first "Totalt" occurrence
-    # This handles both "kr" and "US$" currencies
-    total_pattern = r'Totalt\s+([\d\.,]+)\s+([A-Za-z$€£]+)'
-    total_match = re.search(total_pattern, body)
-    
-    if total_match:
-        # Replace comma with period for consistent decimal handling
-        cost_str = total_match.group(1).replace(',', '.')
-        cost = float(cost_str)
-        currency = total_match.group(2)
-    
-    # Extract date - look for date pattern after "Totalt" amount and before "Tack för att du reser"
-    # This pattern captures Swedish date formats like "5 juli 2025", "7 februari 2025", etc.
-    date_pattern = r'Totalt\s+[\d\.,]+\s+[A-Za-z$€£]+\s+([0-9]{1,2}\s+[a-zA-ZåäöÅÄÖ]+\s+[0-9]{4})'
-    date_match = re.search(date_pattern, body)
-    
-    if date_match:
-        date_str = date_match.group(1).strip()
-        # Convert to ISO format
-        date_str = convert_swedish_date_to_iso(date_str)
-    
-    # Extract passenger name from "Tack för att du reser, [Name]"
-    passenger_pattern = r'Tack för att du reser,\s+([A-Za-zåäöÅÄÖ]+)'
-    passenger_match = re.search(passenger_pattern, body)
-    
-    if passenger_match:
-        passenger = passenger_match.group(1).strip()
-    
-    # Handle special cases like cancellation fees
-    is_cancellation = 'Avbokningsavgift' in body
-    
-    return {
-        'email_id': email_data.get('id'),
-        'cost': cost,
-        'currency': currency,
-        'date': date_str,
-        'passenger': passenger,
-        'is_cancellation': is_cancellation,
-        'subject': email_data.get('subject', ''),
-        'email_date': email_data.get('date', '')
-    }
+    start = 0
+    for marker in _VALUE_SPLIT_RE.finditer(mm):
+        email_data = _parse_email_part(mm[start:marker.start()])
+        if email_data is not None:
+            yield email_data
+        start = marker.end()
+    
+    # The last email runs to the end of the file
+    email_data = _parse_email_part(mm[start:])
+    if email_data is not None:
+        yield email_data
 
 
 def parse_uber_data_file(file_path: str) -> List[Dict[str, Any]]:
@@ -135,64 +186,57 @@ def parse_uber_data_file(file_path: str) -> List[Dict[str, Any]]:
     Parse the uber_data.json file which contains multiple email objects
     separated by "Value #N:" headers.
     
+    Use iter_uber_emails() instead to process large files without
+    holding all emails in memory.
+    
     Args:
         file_path: Path to the input JSON file
         
     Returns:
         List of email data dictionaries
     """
-    emails = []
-    
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Split by "Value #" markers to separate individual emails
-        # The first split might not start with "Value #" so we handle that
-        parts = re.split(r'\n\nValue #\d+:\n\n', content)
-        
-        for part in parts:
-            part = part.strip()
-            if not part:
-                continue
-                
-            try:
-                # Try to parse as JSON
-                if part.startswith('{') and part.endswith('}'):
-                    email_data = json.loads(part)
-                    emails.append(email_data)
-                else:
-                    # Handle the first entry which might not have a "Value #" prefix
-                    if '{' in part:
-                        json_start = part.find('{')
-                        json_part = part[json_start:]
-                        if json_part.endswith('}'):
-                            email_data = json.loads(json_part)
-                            emails.append(email_data)
-            except json.JSONDecodeError as e:
-                print(f"Warning: Could not parse JSON in part: {e}")
-                continue
-                
+        return list(iter_uber_emails(file_path))
     except FileNotFoundError:
         print(f"Error: File '{file_path}' not found.")
         return []
     except Exception as e:
         print(f"Error reading file: {e}")
         return []
-    
-    return emails
 
 
-def function(emails: List[Dict[str, Any]]) -> Tuple[List[str], List[str], List[float], List[str]]:
+def _email_body(email: Dict[str, Any]) -> Any:
+    """Return the body of an email, or None (skipped by extract_receipts) if it has none"""
+    try:
+        return email.get('body', '')
+    except Exception:
+        return None
+
+
+def _extract_email(
+    email: Dict[str, Any],
+) -> Optional[Tuple[Optional[float], Optional[str], Optional[str], Optional[str]]]:
+    """Extract (cost, currency, date, passenger) from one email, or None if it fails"""
+    try:
+        return extract_receipt_fields(email.get('body', ''))
+    except Exception:
+        return None
+
+
+def function(
+    emails: Iterable[Dict[str, Any]],
+) -> Tuple[List[Optional[str]], List[Optional[str]], List[float], List[str]]:
     """
     Extract Uber receipt data from email objects and return as separate lists.
     
     This is a standalone function that can be copied and used elsewhere.
     It extracts cost, currency, date (ISO format), and passenger information
-    from Uber receipt emails.
+    from Uber receipt emails. Large lists are processed in parallel
+    worker processes.
     
     Args:
-        emails: List of email data dictionaries, each containing:
+        emails: List or other iterable (such as iter_uber_emails()) of email
+                data dictionaries, each containing:
                 - 'body': Email body text containing receipt information
                 - 'id': Email ID (optional, for error reporting)
     
@@ -208,96 +252,40 @@ def function(emails: List[Dict[str, Any]]) -> Tuple[List[str], List[str], List[f
     Raises:
         ValueError: If extracted lists have inconsistent lengths
     """
-    
-    def convert_swedish_date_to_iso(date_str: str) -> Optional[str]:
-        """Convert Swedish date format to ISO format (YYYY-MM-DD)"""
-        if not date_str:
-            return None
-        
-        swedish_months = {
-            'januari': '01', 'februari': '02', 'mars': '03', 'april': '04',
-            'maj': '05', 'juni': '06', 'juli': '07', 'augusti': '08',
-            'september': '09', 'oktober': '10', 'november': '11', 'december': '12'
-        }
-        
-        try:
-            parts = date_str.strip().split()
-            if len(parts) != 3:
-                return None
-                
-            day = parts[0].zfill(2)
-            month_swedish = parts[1].lower()
-            year = parts[2]
-            
-            if month_swedish in swedish_months:
-                month = swedish_months[month_swedish]
-                return f"{year}-{month}-{day}"
-            else:
-                return None
-        except Exception:
-            return None
-
-    def extract_single_receipt(email_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract data from a single email receipt"""
-        body = email_data.get('body', '')
-        
-        # Initialize return values
-        cost = None
-        currency = None
-        date_str = None
-        passenger = None
-        
-        # Extract total cost and currency
-        total_pattern = r'Totalt\s+([\d\.,]+)\s+([A-Za-z$€£]+)'
-        total_match = re.search(total_pattern, body)
-        
-        if total_match:
-            cost_str = total_match.group(1).replace(',', '.')
-            cost = float(cost_str)
-            currency = total_match.group(2)
-        
-        # Extract date
-        date_pattern = r'Totalt\s+[\d\.,]+\s+[A-Za-z$€£]+\s+([0-9]{1,2}\s+[a-zA-ZåäöÅÄÖ]+\s+[0-9]{4})'
-        date_match = re.search(date_pattern, body)
-        
-        if date_match:
-            date_str = date_match.group(1).strip()
-            date_str = convert_swedish_date_to_iso(date_str)
-        
-        # Extract passenger name
-        passenger_pattern = r'Tack för att du reser,\s+([A-Za-zåäöÅÄÖ]+)'
-        passenger_match = re.search(passenger_pattern, body)
-        
-        if passenger_match:
-            passenger = passenger_match.group(1).strip()
-        
-        return {
-            'cost': cost,
-            'currency': currency,
-            'date': date_str,
-            'passenger': passenger
-        }
+    if isinstance(emails, list):
+        # Large lists are sharded across processes; only the bodies are sent
+        # to the workers
+        bodies = [_email_body(email) for email in emails]
+        results = map_in_processes(extract_receipts, bodies)
+    else:
+        results = [_extract_email(email) for email in emails]
     
     # Process all emails
-    dates = []
-    passenger_names = []
-    costs = []
-    currencies = []
-    
-    for email in emails:
-        try:
-            extracted = extract_single_receipt(email)
-            
-            # Only include successfully extracted data
-            if extracted['cost'] is not None and extracted['currency'] is not None:
-                dates.append(extracted['date'])
-                passenger_names.append(extracted['passenger'])
-                costs.append(extracted['cost'])
-                currencies.append(extracted['currency'])
-                
-        except Exception:
-            # Skip failed extractions silently
+    # The lists are allocated at full size up front, filled by index and
+    # trimmed to the number of receipts found at the end
+    n = len(results)
+    dates: List[Optional[str]] = [None] * n
+    passenger_names: List[Optional[str]] = [None] * n
+    costs = [0.0] * n
+    currencies = [''] * n
+    k = 0
+    
+    for result in results:
+        # Skip failed extractions silently
+        if result is None:
             continue
+        cost, currency, date, passenger = result
+        
+        # Only include successfully extracted data
+        if cost is None or currency is None:
+            continue
+        dates[k] = date
+        passenger_names[k] = passenger
+        costs[k] = cost
+        currencies[k] = currency
+        k += 1
+    
+    del dates[k:], passenger_names[k:], costs[k:], currencies[k:]
     
     # Validation: Ensure all lists have the same length
     list_lengths = [len(dates), len(passenger_names), len(costs), len(currencies)]
@@ -309,7 +297,9 @@ def function(emails: List[Dict[str, Any]]) -> Tuple[List[str], List[str], List[f
     return dates, passenger_names, costs, currencies
 
 
-def process_all_emails(emails: List[Dict[str, Any]]) -> Tuple[List[str], List[str], List[float], List[str]]:
+def process_all_emails(
+    emails: List[Dict[str, Any]],
+) -> Tuple[List[Optional[str]], List[Optional[str]], List[float], List[str]]:
     """
     Process all emails and extract Uber receipt data (with verbose output)
     
@@ -320,32 +310,37 @@ def process_all_emails(emails: List[Dict[str, Any]]) -> Tuple[List[str], List[st
         Tuple containing (dates, passenger_names, costs, currencies)
         All lists are guaranteed to have the same length (validated)
     """
-    dates = []
-    passenger_names = []
-    costs = []
-    currencies = []
+    # Preallocated and filled by index, like in function()
+    n = len(emails)
+    dates: List[Optional[str]] = [None] * n
+    passenger_names: List[Optional[str]] = [None] * n
+    costs = [0.0] * n
+    currencies = [''] * n
+    k = 0
     
     for i, email in enumerate(emails, 1):
         try:
-            extracted = extract_uber_receipt_data(email)
+            cost, currency, date, passenger = extract_receipt_fields(email.get('body', ''))
             
             # Only include successfully extracted data
-            if extracted['cost'] is not None and extracted['currency'] is not None:
-                dates.append(extracted['date'])  # May be None for cancellations
-                passenger_names.append(extracted['passenger'])  # May be None for cancellations
-                costs.append(extracted['cost'])
-                currencies.append(extracted['currency'])
+            if cost is not None and currency is not None:
+                dates[k] = date  # May be None for cancellations
+                passenger_names[k] = passenger  # May be None for cancellations
+                costs[k] = cost
+                currencies[k] = currency
+                k += 1
                 
                 # Print progress for verification
-                print(f"Entry {i}: {extracted['cost']} {extracted['currency']} - "
-                      f"{extracted['date']} - {extracted['passenger']}")
+                print(f"Entry {i}: {cost} {currency} - {date} - {passenger}")
             else:
-                print(f"Entry {i}: Could not extract data from email {extracted['email_id']}")
+                print(f"Entry {i}: Could not extract data from email {email.get('id')}")
                 
         except Exception as e:
             print(f"Error processing email {i}: {e}")
             continue
     
+    del dates[k:], passenger_names[k:], costs[k:], currencies[k:]
+    
     # Validation step: Ensure all lists have the same length
     list_lengths = [len(dates), len(passenger_names), len(costs), len(currencies)]
     if len(set(list_lengths)) != 1:
@@ -390,18 +385,19 @@ def main():
         print(f"Data validation: All 4 lists contain {len(costs)} elements")
         
         if costs:
-            total_cost_kr = sum(cost for cost, currency in zip(costs, currencies) if currency == 'kr')
-            total_cost_usd = sum(cost for cost, currency in zip(costs, currencies) if currency == 'US$')
+            # Per-currency totals in a single pass over the results
+            totals = {}
+            for cost, currency in zip(costs, currencies):
+                totals[currency] = totals.get(currency, 0.0) + cost
+            total_cost_kr = totals.get('kr', 0.0)
+            total_cost_usd = totals.get('US$', 0.0)
             
             print(f"Total cost in SEK: {total_cost_kr:.2f} kr")
             if total_cost_usd > 0:
                 print(f"Total cost in USD: {total_cost_usd:.2f} US$")
             
             # Count rides per passenger (excluding None values)
-            passengers = {}
-            for passenger in passenger_names:
-                if passenger:
-                    passengers[passenger] = passengers.get(passenger, 0) + 1
+            passengers = Counter(passenger for passenger in passenger_names if passenger)
             
             print("\nRides per passenger:")
             for passenger, count in sorted(passengers.items()):
@@ -0,0 +1,29 @@
+"""Shared pytest fixtures"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import parallel_extract
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    """
+    Force map_in_processes to use a process pool for any batch size.
+
+    Returns the list of functions mapped over the pool, so tests can check
+    that the parallel path was really taken.
+    """
+    pool_maps = []
+
+    class RecordingExecutor(ProcessPoolExecutor):
+        def map(self, *args, **kwargs):
+            pool_maps.append(args[0])
+            return super().map(*args, **kwargs)
+
+    monkeypatch.setattr(parallel_extract, '_PARALLEL_MIN_EMAILS', 1)
+    monkeypatch.setattr(parallel_extract, 'ProcessPoolExecutor', RecordingExecutor)
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    return pool_maps
@@ -0,0 +1,43 @@
+"""Tests for the receipt extraction in extract_uber_inner and its callers"""
+
+import extract_uber_data
+from extract_uber_inner import extract_receipts
+
+BODIES = [
+    'Totalt 284,00 kr 5 juli 2025 Tack för att du reser, Agne Totalt 284,00 kr Respris 246,00 kr',
+    'Ingen kvittotext här',
+    'Avbokningsavgift 50,00 kr 7 februari 2025 Vi ses en annan gång, Viggo',
+    'Totalt 12,50 US$ Totalt 99,00 kr 1 maj 2024 Tack för att du reser, Leona',
+    '',
+    'Totalt 75,00 kr 3 mars 2025 Tack för att du reser, Nadine Totalt 75,00 kr',
+]
+
+
+def test_extract_receipts():
+    assert extract_receipts(BODIES) == [
+        (284.0, 'kr', '2025-07-05', 'Agne'),
+        (None, None, None, None),
+        (50.0, 'kr', '2025-02-07', 'Viggo'),
+        # The date comes from the later total when the first one has none
+        (12.5, 'US$', '2024-05-01', 'Leona'),
+        (None, None, None, None),
+        (75.0, 'kr', '2025-03-03', 'Nadine'),
+    ]
+
+
+def test_extract_receipts_date_after_later_total():
+    body = 'Totalt 284,00 kr\nResa 3 km 2025\nTotalt 284,00 kr 5 juli 2025'
+    assert extract_receipts([body])[0][2] == '2025-07-05'
+
+
+def test_extract_uber_data_parallel_matches_serial(request):
+    emails = [{'body': body} for body in BODIES * 5] + ['not an email', {'id': 'no body'}]
+    serial = extract_uber_data.extract_uber_data(emails)
+
+    # Only switch to the pool once the serial result is known
+    pool_maps = request.getfixturevalue('process_pool')
+    parallel = extract_uber_data.extract_uber_data(emails)
+
+    assert pool_maps
+    assert parallel == serial
+    assert len(serial[0]) == 20
@@ -0,0 +1,104 @@
+"""Tests for reading the data file and extracting receipts in process_uber_receipts"""
+
+import json
+
+import pytest
+
+import process_uber_receipts
+
+EMAILS = [
+    {
+        'id': f'email{i}',
+        'subject': 'Din resa med Uber',
+        # Escaped newlines and marker-like text inside a string are not markers
+        'body': (f'Totalt {100 + i},00 kr {i % 28 + 1} juli 2025 '
+                 f'Tack för att du reser, Agne\nValue #{i}:\n'),
+    }
+    for i in range(25)
+]
+
+
+def _write_data_file(path, emails, newline='\n'):
+    """Write emails in the uber_data.json format, separated by "Value #N:" markers"""
+    parts = [json.dumps(email, indent=4) for email in emails]
+    text = parts[0] + ''.join(f'\n\nValue #{n}:\n\n{part}'
+                              for n, part in enumerate(parts[1:], 2))
+    path.write_bytes(text.replace('\n', newline).encode('utf-8'))
+    return path
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    return _write_data_file(tmp_path / 'uber_data.json', EMAILS)
+
+
+@pytest.mark.parametrize('read_size', [1, 7, 1 << 20])
+def test_iter_uber_emails_markers_split_across_reads(monkeypatch, data_file, read_size):
+    monkeypatch.setattr(process_uber_receipts, '_MMAP_MIN_SIZE', 1 << 62)
+    monkeypatch.setattr(process_uber_receipts, '_READ_CHUNK_SIZE', read_size)
+    assert list(process_uber_receipts.iter_uber_emails(str(data_file))) == EMAILS
+
+
+@pytest.mark.parametrize('read_size', [1, 7, 1 << 20])
+@pytest.mark.parametrize('mmap_min_size', [1, 1 << 62])
+def test_iter_uber_emails_crlf_line_endings(monkeypatch, tmp_path, read_size, mmap_min_size):
+    path = _write_data_file(tmp_path / 'uber_data.json', EMAILS, newline='\r\n')
+    monkeypatch.setattr(process_uber_receipts, '_MMAP_MIN_SIZE', mmap_min_size)
+    monkeypatch.setattr(process_uber_receipts, '_READ_CHUNK_SIZE', read_size)
+    assert list(process_uber_receipts.iter_uber_emails(str(path))) == EMAILS
+
+
+def test_iter_uber_emails_mmap_matches_chunked(monkeypatch, data_file):
+    monkeypatch.setattr(process_uber_receipts, '_MMAP_MIN_SIZE', 1 << 62)
+    chunked = list(process_uber_receipts.iter_uber_emails(str(data_file)))
+
+    mapped_files = []
+    iter_mapped_emails = process_uber_receipts._iter_mapped_emails
+
+    def recording_iter_mapped_emails(mm):
+        mapped_files.append(len(mm))
+        return iter_mapped_emails(mm)
+
+    monkeypatch.setattr(process_uber_receipts, '_MMAP_MIN_SIZE', 1)
+    monkeypatch.setattr(process_uber_receipts, '_iter_mapped_emails', recording_iter_mapped_emails)
+    mapped = list(process_uber_receipts.iter_uber_emails(str(data_file)))
+
+    assert mapped_files
+    assert mapped == chunked == EMAILS
+
+
+def test_iter_uber_emails_empty_file(tmp_path):
+    path = tmp_path / 'empty.json'
+    path.write_bytes(b'')
+    assert list(process_uber_receipts.iter_uber_emails(str(path))) == []
+
+
+def test_parse_uber_data_file_missing_file(tmp_path):
+    assert process_uber_receipts.parse_uber_data_file(str(tmp_path / 'missing.json')) == []
+
+
+def test_function_parallel_matches_serial(request):
+    emails = EMAILS + [
+        {'body': 'Totalt 1.2.3 kr'},  # Malformed cost
+        {'body': None},
+        'not an email',
+        {'id': 'no body'},
+    ]
+    serial = process_uber_receipts.function(emails)
+
+    # Only switch to the pool once the serial result is known
+    pool_maps = request.getfixturevalue('process_pool')
+    parallel = process_uber_receipts.function(emails)
+
+    assert pool_maps
+    assert parallel == serial
+    assert len(serial[0]) == len(EMAILS)
+
+
+def test_function_accepts_iterator(data_file):
+    emails = process_uber_receipts.iter_uber_emails(str(data_file))
+    dates, passengers, costs, currencies = process_uber_receipts.function(emails)
+    assert costs == [100.0 + i for i in range(len(EMAILS))]
+    assert dates[0] == '2025-07-01'
+    assert set(passengers) == {'Agne'}
+    assert set(currencies) == {'kr'}